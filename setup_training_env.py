@@ -6,6 +6,7 @@ Installs packages to separate directory instead of creating venv.
 Usage:
     python setup_training_env.py
     python setup_training_env.py --force  # Force reinstall
+    python setup_training_env.py --offline  # Install from local wheels/ folder
 """
 
 import sys
@@ -21,6 +22,8 @@ from venv_manager import StandalonePackageManager
 def main():
     parser = argparse.ArgumentParser(description="Setup Flux2 training packages")
     parser.add_argument("--force", action="store_true", help="Force reinstall packages")
+    parser.add_argument("--offline", action="store_true",
+                        help="Install from local wheels/ folder (downloaded once if missing)")
     args = parser.parse_args()
     
     print("=" * 70)
@@ -70,7 +73,7 @@ def main():
     print("  ...")
     print()
     
-    success, msg = manager.setup_training_packages(force_reinstall=args.force)
+    success, msg = manager.setup_training_packages(force_reinstall=args.force, offline=args.offline)
     
     if not success:
         print(f"\n✗ Setup failed: {msg}")
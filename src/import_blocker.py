@@ -50,7 +50,14 @@ class ProperFakeModule(ModuleType):
         - triton.language -> returns self
         - (self).dtype -> returns self
         Result: triton.language.dtype = self (an object, not None)
+
+        The result is stored in the module __dict__, so torch._dynamo's
+        repeated probes of the same name are plain dict hits afterwards
+        (__getattr__ only runs when normal lookup fails). Dunder names are
+        not stored, so protocol lookups keep their default behavior.
         """
+        if not (item.startswith('__') and item.endswith('__')):
+            self.__dict__[item] = self
         return self
     
     def __call__(self, *args, **kwargs):
@@ -8,16 +8,53 @@ into a separate directory and manipulate sys.path instead.
 import os
 import sys
 import subprocess
+import hashlib
+import importlib
 import json
+import re
+import select
 import shutil
+import signal
+import string
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Optional, Tuple, List, Dict
 
+# Fast JSON for install cache (graceful fallback to stdlib)
+try:
+    import orjson
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+    _json_loads = json.loads
+
+# ComfyUI imports (graceful fallback if not available)
+try:
+    from server import PromptServer
+except ImportError:
+    PromptServer = None
+
 
 class StandalonePackageManager:
     """
     Manages isolated package directory for training without using venv.
     Compatible with embedded Python.
+    
+    Environment variables:
+        FLUX_PIP_INDEX_URL: Package index for all pip installs
+            (default: pip/uv's own configuration, e.g. PIP_INDEX_URL, pip.conf)
+        FLUX_PIP_EXTRA_INDEX_URL: Optional additional index (e.g. local wheelhouse)
+        FLUX_PIP_TIMEOUT: Default install_timeout in seconds (default: 300)
+        FLUX_USE_UV: Set to 0 to never use uv even if it is installed
+        PIP_CACHE_DIR: pip download/wheel cache shared by all installs
+            (default: <plugin>/.pip_cache)
+        UV_CACHE_DIR: uv's cache, kept separate from pip's (default: <plugin>/.uv_cache)
     """
     
     # Complete isolated dependency tree for sd-scripts training
@@ -52,27 +89,134 @@ class StandalonePackageManager:
         'packaging': '23.2',  # version parsing
     }
     
-    def __init__(self, base_dir: Optional[str] = None):
-        """Initialize StandalonePackageManager."""
+    # Packages that must resolve from training_libs for training to work
+    CRITICAL_PACKAGES = [
+        'transformers',
+        'tokenizers',
+        'diffusers',
+        'accelerate',
+        'huggingface_hub',
+        'safetensors',
+    ]
+    
+    # Approximate install cost (wheel MB, weighted for file count) used to
+    # start the slowest packages first; unlisted packages weigh 1
+    _PKG_WEIGHT = {
+        'transformers': 20,
+        'diffusers': 15,
+        'tokenizers': 3,
+        'safetensors': 2,
+        'huggingface_hub': 2,
+        'accelerate': 1,
+        'regex': 1,
+    }
+    
+    # Import check run by _verify_subprocess; prints one JSON line of results.
+    # $libs / $pkgs are JSON literals (valid Python), so Windows paths need no escaping.
+    _VERIFY_TEMPLATE = string.Template("""
+import sys, json
+sys.path.insert(0, $libs)
+out = []
+for p in $pkgs:
+    try:
+        m = __import__(p)
+        out.append({'p': p, 'v': getattr(m, '__version__', 'unknown'), 'l': getattr(m, '__file__', '?')})
+    except Exception as e:
+        out.append({'p': p, 'err': str(e)})
+try:
+    import torch
+    out.append({'p': 'torch', 'v': torch.__version__, 'l': torch.__file__})
+except Exception as e:
+    out.append({'p': 'torch', 'err': str(e)})
+print(json.dumps(out))
+""")
+    
+    # pip versions at or above this are not upgraded before installing
+    PIP_MIN_VERSION = "24.2"
+    
+    # Non-interactive pip settings for every pip subprocess (ignored by uv,
+    # which never prompts or self-checks). Plain output lines also keep the
+    # progress callbacks readable.
+    _PIP_ENV = {
+        "PIP_NO_INPUT": "1",  # Never stall on auth/confirmation prompts
+        "PIP_DISABLE_PIP_VERSION_CHECK": "1",
+        "PIP_PROGRESS_BAR": "off",
+    }
+    
+    # Install output lines forwarded to progress callbacks (pip and uv wording)
+    _PROGRESS_MARKERS = ("Collecting", "Downloading", "Installing", "Successfully installed",
+                         "Prepared", "Installed")
+    _COLLECTING_RE = re.compile(r"Collecting ([A-Za-z0-9._-]+)")
+    
+    def __init__(
+        self,
+        base_dir: Optional[str] = None,
+        install_timeout: Optional[int] = None,
+        verify_timeout: int = 30,
+        max_workers: int = 4,
+    ):
+        """
+        Initialize StandalonePackageManager.
+        
+        Args:
+            base_dir: Plugin directory (defaults to this plugin's root)
+            install_timeout: Seconds allowed per pip invocation
+                (defaults to FLUX_PIP_TIMEOUT env var, else 300)
+            verify_timeout: Seconds allowed for the subprocess import check
+            max_workers: Max concurrent pip installs
+        """
         if base_dir is None:
             base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         
+        if install_timeout is None:
+            install_timeout = int(os.environ.get("FLUX_PIP_TIMEOUT", 300))
+        self.install_timeout = install_timeout
+        self.verify_timeout = verify_timeout
+        self.max_workers = max_workers
+        
         self.base_dir = Path(base_dir)
         self.libs_dir = self.base_dir / "training_libs"
-        self.cache_file = self.libs_dir / ".install_cache.json"
+        # Resolved once: avoids getcwd() + Path allocations on every subprocess spawn
+        self._libs_path_str = str(self.libs_dir.resolve())
+        # Named after the pinned requirement set: a file for the current pins
+        # existing means they were installed, and changed pins miss automatically
+        self.cache_file = self.libs_dir / f".install_cache.{self._requirements_hash()}.json"
+        # Live outside libs_dir so force-reinstalls reuse downloaded wheels
+        # (an existing user PIP_CACHE_DIR is reused rather than duplicated)
+        self.pip_cache_dir = Path(os.environ.get("PIP_CACHE_DIR") or self.base_dir / ".pip_cache")
+        # uv's cache layout differs from pip's, so it never shares pip's directory
+        self.uv_cache_dir = Path(os.environ.get("UV_CACHE_DIR") or self.base_dir / ".uv_cache")
+        self.wheels_dir = self.base_dir / "wheels"
+        
+        # Memoized libs_exist() result (directory doesn't change once installed)
+        self._exists_cache: Optional[bool] = None
+        # Parsed install cache (see _load_cache)
+        self._cache: Optional[Dict] = None
+        # pip version once known to be >= PIP_MIN_VERSION (skips upgrade step)
+        self._pip_ok: Optional[str] = None
+        # uv command prefix (see _detect_uv), resolved on first install
+        self._uv_checked = False
+        self._uv_cmd: Optional[List[str]] = None
+        # Last (input PYTHONPATH, output PYTHONPATH) pair from get_modified_env
+        self._pythonpath_memo: Optional[Tuple[str, str]] = None
+        # Running pip/uv processes, killed if an install is interrupted
+        # (see _kill_children_on_abort)
+        self._procs_lock = threading.Lock()
+        self._live_procs: set = set()
+        self._aborting = False
         
     def libs_exist(self) -> bool:
         """Check if training libs directory exists and has packages."""
-        if not self.libs_dir.exists():
-            return False
+        if self._exists_cache:
+            return True
         
-        # Check if cache file exists
-        if not self.cache_file.exists():
-            return False
+        # The install cache is written only after an install run, and its name
+        # encodes the requirement set - a single stat, no read/parse
+        has_packages = self.cache_file.is_file()
         
-        # Check if at least some packages are installed
-        site_packages = self.libs_dir
-        has_packages = any(site_packages.glob("*"))
+        # Only cache positive result - a missing install may appear later
+        if has_packages:
+            self._exists_cache = True
         
         return has_packages
     
@@ -80,6 +224,356 @@ class StandalonePackageManager:
         """Get current Python executable."""
         return sys.executable
     
+    def _detect_uv(self) -> Optional[List[str]]:
+        """
+        Find uv (much faster resolver/installer than pip), cached per instance.
+        
+        Returns:
+            Command prefix to run uv, or None to use pip
+        """
+        if self._uv_checked:
+            return self._uv_cmd
+        self._uv_checked = True
+        
+        if os.environ.get("FLUX_USE_UV", "1") == "0":
+            return None
+        
+        uv_bin = shutil.which("uv")
+        if uv_bin:
+            self._uv_cmd = [uv_bin]
+        else:
+            try:
+                returncode, _ = self._run_captured(
+                    [self._get_python_exe(), "-m", "uv", "--version"],
+                    self.verify_timeout
+                )
+                if returncode == 0:
+                    self._uv_cmd = [self._get_python_exe(), "-m", "uv"]
+            except Exception:
+                pass
+        
+        return self._uv_cmd
+    
+    def _install_command(self, specs: List[str], pip_opts: List[str], use_uv: bool = True) -> List[str]:
+        """Build install argv for specs into training_libs (uv if available and use_uv, else pip)."""
+        common = [
+            "--target", self._libs_path_str,
+            "--no-deps",  # Important: don't install dependencies automatically
+        ]
+        
+        uv_cmd = self._detect_uv() if use_uv else None
+        if uv_cmd:
+            # Swap pip's --cache-dir for uv's own cache
+            uv_opts = []
+            skip = False
+            for opt in pip_opts:
+                if skip:
+                    skip = False
+                elif opt == "--cache-dir":
+                    skip = True
+                else:
+                    uv_opts.append(opt)
+            return [
+                *uv_cmd, "pip", "install", *specs, *common,
+                "--python", self._get_python_exe(),
+                "--only-binary", ":all:",
+                "--cache-dir", str(self.uv_cache_dir),
+                *uv_opts,
+            ]
+        
+        return [
+            self._get_python_exe(), "-m", "pip", "install", *specs, *common,
+            "--no-warn-script-location",
+            "--no-compile",  # Byte-compiled once afterwards by _compile_libs()
+            "--only-binary=:all:",  # Never fall back to slow sdist builds
+            *pip_opts,
+        ]
+    
+    def _get_pip_version(self, python_exe: str) -> Optional[str]:
+        """Query installed pip version (e.g. '24.0'), None on failure."""
+        try:
+            returncode, stdout = self._run_captured(
+                [python_exe, "-m", "pip", "--version"],
+                self.verify_timeout
+            )
+            # Output format: "pip 24.0 from /path/to/pip (python 3.11)"
+            if returncode == 0:
+                return stdout.split()[1]
+        except Exception:
+            pass
+        return None
+    
+    def _pip_index_args(self) -> List[str]:
+        """
+        Package index options (shared by pip and uv).
+        
+        Only emitted when the FLUX_* overrides are set, so user-configured
+        mirrors (PIP_INDEX_URL, pip.conf, UV_INDEX_URL) keep working.
+        """
+        index_url = os.environ.get("FLUX_PIP_INDEX_URL", "")
+        extra_index_url = os.environ.get("FLUX_PIP_EXTRA_INDEX_URL", "")
+        args = []
+        if index_url:
+            args += ["--index-url", index_url]
+        if extra_index_url:
+            args += ["--extra-index-url", extra_index_url]
+        return args
+    
+    def _requirement_specs(self) -> List[str]:
+        """'package==version' for every requirement this platform installs."""
+        return [
+            f"{package}=={version}"
+            for package, version in self.TRAINING_REQUIREMENTS.items()
+            if version != 'SKIP'
+            and not (package == 'bitsandbytes' and sys.platform == 'win32')
+        ]
+    
+    def _requirements_hash(self) -> str:
+        """Fingerprint of the pinned requirement set (changes when pins change)."""
+        canonical = json.dumps(sorted(self.TRAINING_REQUIREMENTS.items()))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+    
+    def _has_stale_cache(self) -> bool:
+        """True if training_libs holds an install cache for different pins."""
+        try:
+            with os.scandir(self.libs_dir) as it:
+                return any(
+                    e.name.startswith(".install_cache.") and e.name.endswith(".json")
+                    and e.name != self.cache_file.name
+                    for e in it
+                )
+        except OSError:
+            return False
+    
+    def _has_local_wheels(self) -> bool:
+        """True if wheels_dir contains at least one file."""
+        try:
+            with os.scandir(self.wheels_dir) as it:
+                return next((True for _ in it), False)
+        except OSError:
+            return False
+    
+    def _prefetch_wheels(self, progress_callback=None) -> Tuple[bool, str]:
+        """
+        Download wheels for all requirements into wheels_dir.
+        
+        After this, installs can run with --no-index (fully offline),
+        so repair reinstalls never contact the package index. Each spec is
+        downloaded by its own pip process (largest first) so transfers
+        overlap; pip download into a shared directory is safe concurrently.
+        """
+        print(f"[PKG-MGR] Downloading wheels to {self.wheels_dir}...")
+        
+        def on_line(line):
+            if progress_callback and ('Downloading' in line or 'Saved' in line):
+                progress_callback("wheels", line.strip())
+        
+        def download(spec):
+            try:
+                returncode, output_tail = self._run_pip_streaming(
+                    [
+                        self._get_python_exe(), "-m", "pip", "download",
+                        spec,
+                        "-d", str(self.wheels_dir),
+                        "--no-deps",
+                        "--only-binary=:all:",
+                        "--cache-dir", str(self.pip_cache_dir),
+                        *self._pip_index_args(),
+                    ],
+                    on_line
+                )
+            except subprocess.TimeoutExpired:
+                return f"{spec}: Wheel download timeout"
+            except Exception as e:
+                return f"{spec}: Wheel download failed: {e}"
+            
+            if returncode != 0:
+                return f"{spec}: Wheel download failed: {output_tail}"
+            return None
+        
+        try:
+            self.wheels_dir.mkdir(parents=True, exist_ok=True)
+        except Exception as e:
+            return False, f"Wheel download failed: {e}"
+        
+        specs = sorted(
+            self._requirement_specs(),
+            key=lambda spec: -self._PKG_WEIGHT.get(spec.split("==")[0], 1)
+        )
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(specs)) or 1) as executor:
+            with self._kill_children_on_abort(executor):
+                errors = [error for error in executor.map(download, specs) if error]
+        
+        if errors:
+            return False, "\n".join(errors)
+        
+        return True, "Wheels downloaded"
+    
+    def _get_recent_pip_version(self) -> Optional[str]:
+        """
+        Return pip version if it is at least PIP_MIN_VERSION, else None.
+        
+        Installs run with sys.executable, so the pip importable here is the one
+        that will be used - no subprocess needed. Falls back to the version
+        recorded in the install cache. A positive answer is kept on self._pip_ok.
+        """
+        if self._pip_ok:
+            return self._pip_ok
+        try:
+            try:
+                from packaging.version import parse
+            except ImportError:
+                from pip._vendor.packaging.version import parse
+            
+            try:
+                import pip
+                current = pip.__version__
+            except ImportError:
+                current = self._load_cache().get("pip_version")
+            
+            if current and parse(current) >= parse(self.PIP_MIN_VERSION):
+                self._pip_ok = current
+                return current
+        except Exception:
+            # Missing/corrupt cache - fall back to upgrading
+            pass
+        return None
+    
+    @staticmethod
+    def _normalize_name(name: str) -> str:
+        """Normalize distribution name as used in dist-info folder names."""
+        return re.sub(r"[-_.]+", "_", name).lower()
+    
+    def _installed_dists(self) -> set:
+        """Return {(normalized_name, version)} for dist-info folders in training_libs."""
+        dists = set()
+        try:
+            with os.scandir(self.libs_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(".dist-info") and entry.is_dir():
+                        name, _, version = entry.name[:-len(".dist-info")].rpartition("-")
+                        dists.add((self._normalize_name(name), version))
+        except OSError:
+            pass
+        return dists
+    
+    def _link_from_system(self, package: str, version: str) -> bool:
+        """
+        Reuse an exact-version copy of package from the base interpreter.
+        
+        Files listed in the distribution's RECORD are hardlinked into
+        training_libs (copied if linking fails, e.g. across drives), so no
+        download/unpack is needed. Only used when none of the distribution's
+        top-level entries exist in training_libs yet, so a failure can be
+        rolled back and left to pip.
+        
+        Returns:
+            True if the package is now present in training_libs
+        """
+        import importlib.metadata
+        
+        try:
+            dist = importlib.metadata.distribution(package)
+        except importlib.metadata.PackageNotFoundError:
+            return False
+        
+        if dist.version.split("+")[0] != version or not dist.files:
+            return False
+        
+        # Found in training_libs itself (it is on sys.path) - nothing to reuse
+        if Path(dist.locate_file("")).resolve() == Path(self._libs_path_str):
+            return False
+        
+        # Skip scripts etc. installed outside site-packages ("../../bin/...")
+        files = [f for f in dist.files if ".." not in f.parts]
+        top_level = {f.parts[0] for f in files}
+        if any((self.libs_dir / name).exists() for name in top_level):
+            return False
+        
+        try:
+            for f in files:
+                src = dist.locate_file(f)
+                dst = self.libs_dir / f
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    os.link(src, dst)
+                except OSError:
+                    shutil.copy2(src, dst)
+        except Exception as e:
+            print(f"[PKG-MGR] Could not reuse system {package}: {e}")
+            for name in top_level:
+                path = self.libs_dir / name
+                if path.is_dir():
+                    shutil.rmtree(path, ignore_errors=True)
+                elif path.exists():
+                    path.unlink()
+            return False
+        
+        return True
+    
+    @staticmethod
+    def _fast_rmtree(root: Path) -> None:
+        """
+        Remove directory tree, deleting top-level entries in parallel.
+        
+        Package folders (transformers, diffusers, ...) hold tens of thousands
+        of small files; unlinks in different subtrees don't contend, so
+        spreading them over threads is much faster than one rmtree walk.
+        """
+        def remove_entry(entry_path: str, is_dir: bool) -> None:
+            try:
+                if is_dir:
+                    shutil.rmtree(entry_path)
+                else:
+                    os.unlink(entry_path)
+            except FileNotFoundError:
+                pass  # Removed concurrently
+        
+        with os.scandir(root) as it:
+            entries = [(e.path, e.is_dir(follow_symlinks=False)) for e in it]
+        
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            # list() re-raises the first task error after all tasks finish
+            list(executor.map(lambda e: remove_entry(*e), entries))
+        
+        os.rmdir(root)
+    
+    def _remove_in_background(self, paths: List[Path]) -> None:
+        """Delete directories on a daemon thread (best effort, errors ignored)."""
+        def worker():
+            for path in paths:
+                try:
+                    self._fast_rmtree(path)
+                except Exception:
+                    # Leftovers are reaped at the next startup (see reap_trash)
+                    pass
+        
+        threading.Thread(target=worker, name="pkg-mgr-trash", daemon=True).start()
+    
+    def _trash_dirs(self) -> List[Path]:
+        """Leftover .trash.* directories from earlier forced reinstalls."""
+        try:
+            with os.scandir(self.base_dir) as it:
+                return [
+                    Path(e.path) for e in it
+                    if e.name.startswith(".trash.") and e.is_dir(follow_symlinks=False)
+                ]
+        except OSError:
+            return []
+    
+    def reap_trash(self) -> None:
+        """
+        Delete leftover .trash.* directories in the background.
+        
+        Each is a full old training_libs whose deletion was cut short (crash,
+        or a CLI --force run exiting before its daemon deleter finished).
+        Called at startup, so they don't wait for the next reinstall.
+        """
+        trash = self._trash_dirs()
+        if trash:
+            print(f"[PKG-MGR] Removing {len(trash)} leftover package director{'y' if len(trash) == 1 else 'ies'}...")
+            self._remove_in_background(trash)
+    
     def create_libs_dir(self, force: bool = False) -> Tuple[bool, str]:
         """
         Create training libs directory.
@@ -95,13 +589,29 @@ class StandalonePackageManager:
         
         print("[PKG-MGR] Creating training package directory...")
         
+        # Reap directories whose background deletion was cut short (e.g. crash)
+        trash = self._trash_dirs()
+        
         # Remove old directory if forcing
         if force and self.libs_dir.exists():
+            self._exists_cache = None
+            self._cache = None
             print("[PKG-MGR] Removing old package directory...")
+            # Renaming is a metadata-only operation, so installation can start
+            # right away while the old tree is deleted in the background
+            old_dir = self.base_dir / f".trash.{os.getpid()}.{time.time_ns()}"
             try:
-                shutil.rmtree(self.libs_dir)
-            except Exception as e:
-                return False, f"Failed to remove old directory: {e}"
+                self.libs_dir.rename(old_dir)
+                trash.append(old_dir)
+            except OSError:
+                # Rename can fail when files are held open (Windows) - delete in place
+                try:
+                    self._fast_rmtree(self.libs_dir)
+                except Exception as e:
+                    return False, f"Failed to remove old directory: {e}"
+        
+        if trash:
+            self._remove_in_background(trash)
         
         # Create new directory
         try:
@@ -112,33 +622,71 @@ class StandalonePackageManager:
         
         return True, "Package directory created"
     
-    def install_packages(self, progress_callback=None) -> Tuple[bool, List[str]]:
-        """Install training requirements (excluding torch/torchvision - use system versions)."""
+    def install_packages(self, progress_callback=None, offline: bool = False) -> Tuple[bool, List[str]]:
+        """
+        Install training requirements (excluding torch/torchvision - use system versions).
+        
+        Args:
+            progress_callback: Optional callable(package, status)
+            offline: Install from wheels_dir with --no-index (no network access)
+        """
         if not self.libs_dir.exists():
             return False, ["Package directory does not exist"]
         
         python_exe = self._get_python_exe()
         errors = []
         installed = []
+        self._aborting = False
         
-        # Upgrade pip first
-        print("[PKG-MGR] Ensuring pip is up to date...")
-        try:
-            subprocess.run(
-                [python_exe, "-m", "pip", "install", "--upgrade", "pip"],
-                check=True,
-                capture_output=True,
-                timeout=120
-            )
-        except Exception as e:
-            print(f"[PKG-MGR] Warning: Could not upgrade pip: {e}")
+        if offline:
+            if not self._has_local_wheels():
+                return False, [f"No local wheels in {self.wheels_dir}"]
+            pip_opts = ["--no-index", "--find-links", str(self.wheels_dir)]
+        else:
+            pip_opts = ["--cache-dir", str(self.pip_cache_dir), *self._pip_index_args()]
+            # Prefetched wheels (see _prefetch_wheels) are used before the index
+            if self._has_local_wheels():
+                pip_opts += ["--find-links", str(self.wheels_dir)]
+        
+        # Resolve installer once, before worker threads need it
+        uv_cmd = self._detect_uv()
+        if uv_cmd:
+            print(f"[PKG-MGR] Using uv for installs: {' '.join(uv_cmd)}")
+        
+        # Upgrade pip first (unless it is already recent, or uv does the installs)
+        pip_version = self._get_recent_pip_version()
+        if offline:
+            print("[PKG-MGR] Offline install, skipping pip upgrade")
+            pip_version = pip_version or self._get_pip_version(python_exe)
+        elif uv_cmd:
+            print("[PKG-MGR] Installing with uv, skipping pip upgrade")
+        elif pip_version:
+            print(f"[PKG-MGR] pip {pip_version} is recent, skipping upgrade")
+        else:
+            print("[PKG-MGR] Ensuring pip is up to date...")
+            try:
+                returncode, output_tail = self._run_pip_streaming(
+                    [python_exe, "-m", "pip", "install", "--upgrade", "pip", *pip_opts]
+                )
+                if returncode != 0:
+                    print(f"[PKG-MGR] Warning: Could not upgrade pip:\n{output_tail}")
+            except Exception as e:
+                print(f"[PKG-MGR] Warning: Could not upgrade pip: {e}")
+            pip_version = self._get_pip_version(python_exe)
         
         # === SKIP TORCH/TORCHVISION (Use system versions) ===
         print("[PKG-MGR] Note: Using system PyTorch (already in ComfyUI)")
         print("[PKG-MGR] Installing packages with correct versions...")
         
-        # Install other packages (the ones that actually conflict)
-        for package, version in self.TRAINING_REQUIREMENTS.items():
+        # Install other packages (the ones that actually conflict), largest first
+        packages = sorted(
+            self.TRAINING_REQUIREMENTS.items(),
+            key=lambda pv: -self._PKG_WEIGHT.get(pv[0], 1)
+        )
+        already_installed = self._installed_dists()
+        pending = []
+        
+        for package, version in packages:
             if version == 'SKIP':
                 print(f"[PKG-MGR] Skipping {package} (using system version)")
                 continue
@@ -148,60 +696,73 @@ class StandalonePackageManager:
                 print(f"[PKG-MGR] Skipping {package} (Windows compatibility)")
                 continue
             
-            print(f"[PKG-MGR] Installing {package}=={version}...")
+            # Exact version already present - pip would only re-resolve it
+            if (self._normalize_name(package), version) in already_installed:
+                installed.append(package)
+                print(f"[PKG-MGR] ✓ {package}=={version} already installed")
+                if progress_callback:
+                    progress_callback(package, "already installed")
+                continue
             
-            try:
+            # Same version in the base interpreter - link it instead of downloading
+            if self._link_from_system(package, version):
+                installed.append(package)
+                print(f"[PKG-MGR] ✓ {package}=={version} linked from system site-packages")
                 if progress_callback:
-                    progress_callback(package, "installing")
-                
-                result = subprocess.run(
-                    [
-                        python_exe, "-m", "pip", "install",
-                        f"{package}=={version}",
-                        "--target", str(self.libs_dir),
-                        "--no-warn-script-location",
-                        "--no-deps",  # Important: don't install dependencies automatically
-                    ],
-                    capture_output=True,
-                    text=True,
-                    timeout=180  # 3 minutes per package
-                )
-                
-                if result.returncode == 0:
-                    installed.append(package)
-                    print(f"[PKG-MGR] ✓ {package} installed")
-                    if progress_callback:
-                        progress_callback(package, "success")
+                    progress_callback(package, "linked from system")
+                continue
+            
+            pending.append((package, version))
+        
+        needs_compile = bool(pending)
+        
+        # Batched pip runs: one interpreter/pip startup and HTTP session per
+        # group instead of per package. The long-pole packages (transformers,
+        # diffusers, ...) run concurrently with the small pure-Python ones,
+        # so the small group's latency is hidden entirely.
+        if len(pending) > 1:
+            large = [pv for pv in pending if self._PKG_WEIGHT.get(pv[0], 1) > 1]
+            small = [pv for pv in pending if self._PKG_WEIGHT.get(pv[0], 1) <= 1]
+            groups = [(label, group) for label, group in (("large", large), ("small", small)) if group]
+            
+            with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+                with self._kill_children_on_abort(executor):
+                    results = list(executor.map(
+                        lambda lg: self._install_batch(lg[1], pip_opts, progress_callback, label=f"batch:{lg[0]}"),
+                        groups
+                    ))
+            
+            pending = []
+            for (_, group), ok in zip(groups, results):
+                if ok:
+                    installed.extend(package for package, _ in group)
                 else:
-                    error_msg = f"{package}: {result.stderr[:200]}"
-                    errors.append(error_msg)
-                    print(f"[PKG-MGR] ✗ {package} failed: {result.stderr[:200]}")
-                    if progress_callback:
-                        progress_callback(package, "failed")
-                        
-            except subprocess.TimeoutExpired:
-                errors.append(f"{package}: Timeout")
-                print(f"[PKG-MGR] ✗ {package} timeout")
-                if progress_callback:
-                    progress_callback(package, "timeout")
-            except Exception as e:
-                errors.append(f"{package}: {str(e)}")
-                print(f"[PKG-MGR] ✗ {package} failed: {e}")
-                if progress_callback:
-                    progress_callback(package, "failed")
+                    pending.extend(group)
         
-        # Save cache
-        cache_data = {
-            "installed_packages": installed,
-            "python_version": f"{sys.version_info.major}.{sys.version_info.minor}",
-            "note": "torch/torchvision use system packages",
-        }
+        # Per-package fallback pinpoints which spec broke. pip --target
+        # installs of disjoint packages are independent and
+        # network/subprocess bound, so run them concurrently (largest first)
+        if pending:
+            workers = min(self.max_workers, len(pending))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                with self._kill_children_on_abort(executor):
+                    futures = {
+                        executor.submit(self._install_one, package, version, pip_opts, progress_callback): package
+                        for package, version in pending
+                    }
+                    for future in as_completed(futures):
+                        package = futures[future]
+                        error = future.result()
+                        if error is None:
+                            installed.append(package)
+                        else:
+                            errors.append(error)
         
-        try:
-            with open(self.cache_file, "w") as f:
-                json.dump(cache_data, f, indent=2)
-        except Exception as e:
-            print(f"[PKG-MGR] Warning: Cache save failed: {e}")
+        # Installs ran with --no-compile; byte-compile everything once, in parallel
+        if needs_compile:
+            self._compile_libs()
+        
+        self._save_cache(installed, pip_version)
         
         if errors:
             print(f"[PKG-MGR] Completed with {len(errors)} errors")
@@ -209,27 +770,338 @@ class StandalonePackageManager:
         else:
             print(f"[PKG-MGR] ✓ Successfully installed {len(installed)} packages")
             return True, []
+    
+    def _compile_libs(self) -> None:
+        """Byte-compile training_libs in one parallel compileall pass (best effort)."""
+        print("[PKG-MGR] Compiling bytecode...")
+        try:
+            returncode, _ = self._run_captured(
+                [
+                    self._get_python_exe(), "-m", "compileall", "-q",
+                    "-j", str(os.cpu_count() or 4),
+                    self._libs_path_str,
+                ],
+                self.install_timeout
+            )
+            # Non-zero just means some files failed to compile (e.g. py2-only
+            # test files); they are compiled lazily on import instead
+            if returncode != 0:
+                print("[PKG-MGR] Warning: Some files could not be byte-compiled")
+        except Exception as e:
+            print(f"[PKG-MGR] Warning: Bytecode compilation skipped: {e}")
+    
+    # Popen kwargs putting the child in its own process group/session, so
+    # _kill_tree() also reaches grandchildren (build backends, uv workers)
+    _NEW_GROUP = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP} if os.name == "nt" else {"start_new_session": True}
+    
+    @staticmethod
+    def _kill_tree(proc: subprocess.Popen) -> None:
+        """Kill proc and its descendants (proc must be started with _NEW_GROUP)."""
+        try:
+            if os.name == "nt":
+                subprocess.run(
+                    ["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL
+                )
+            else:
+                os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        # Fallback / already-exited group: make sure the direct child is gone
+        try:
+            proc.kill()
+        except OSError:
+            pass
+    
+    @contextmanager
+    def _kill_children_on_abort(self, executor: ThreadPoolExecutor):
+        """
+        Kill running pip/uv trees if the body raises (e.g. KeyboardInterrupt).
+        
+        Children run in their own process group (_NEW_GROUP), so a terminal
+        Ctrl+C never reaches them; without this the executor's exit would wait
+        for every queued and running install to finish on its own, and an
+        orphaned pip could keep writing to training_libs after the setup lock
+        is released. Once aborted, no new pip/uv process is started until the
+        next install_packages()/setup_training_packages() call.
+        """
+        try:
+            yield
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            with self._procs_lock:
+                self._aborting = True
+                procs = list(self._live_procs)
+            for proc in procs:
+                self._kill_tree(proc)
+            raise
+    
+    @staticmethod
+    def _start_watchdog(proc: subprocess.Popen, timeout: float) -> Tuple[threading.Timer, threading.Event]:
+        """
+        Kill proc after timeout seconds using a single Timer (no polling).
         
-        # Save cache
+        Returns:
+            (timer, fired): cancel the timer once proc exits; fired is set if
+            the process was killed for running too long
+        """
+        fired = threading.Event()
+        
+        def expire():
+            fired.set()
+            StandalonePackageManager._kill_tree(proc)
+        
+        timer = threading.Timer(timeout, expire)
+        timer.daemon = True
+        timer.start()
+        return timer, fired
+    
+    def _run_captured(self, argv: List[str], timeout: float) -> Tuple[int, str]:
+        """
+        Run a command to completion, capturing stdout (stderr is discarded).
+        
+        Returns:
+            (returncode, stdout)
+            
+        Raises:
+            subprocess.TimeoutExpired: If timeout is exceeded
+        """
+        proc = subprocess.Popen(
+            argv,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            **self._NEW_GROUP
+        )
+        watchdog, fired = self._start_watchdog(proc, timeout)
+        try:
+            stdout, _ = proc.communicate()
+        finally:
+            watchdog.cancel()
+            if proc.poll() is None:
+                self._kill_tree(proc)
+                proc.wait()
+        
+        if fired.is_set():
+            raise subprocess.TimeoutExpired(proc.args, timeout)
+        
+        return proc.returncode, stdout
+    
+    def _run_pip_streaming(self, argv: List[str], on_line=None) -> Tuple[int, str]:
+        """
+        Run pip, streaming merged stdout/stderr line by line.
+        
+        Memory stays bounded: only the last 40 lines are kept (for errors).
+        
+        Returns:
+            (returncode, output_tail)
+            
+        Raises:
+            subprocess.TimeoutExpired: If install_timeout is exceeded
+        """
+        with self._procs_lock:
+            if self._aborting:
+                raise RuntimeError("Install aborted")
+            proc = subprocess.Popen(
+                argv,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                bufsize=1,
+                env={**os.environ, **self._PIP_ENV},
+                **self._NEW_GROUP
+            )
+            self._live_procs.add(proc)
+        
+        tail = deque(maxlen=40)
+        # The read only ends once every holder of the pipe's write end exits.
+        # The watchdog kills the whole process group, so a hung pip can't keep
+        # it open through a grandchild that inherited stdout
+        watchdog, fired = self._start_watchdog(proc, self.install_timeout)
+        try:
+            for line in proc.stdout:
+                tail.append(line)
+                if on_line:
+                    on_line(line)
+            returncode = proc.wait()
+        finally:
+            watchdog.cancel()
+            # Reading or on_line failed: don't leave pip writing to --target
+            # while the caller falls back to other installs
+            if proc.poll() is None:
+                self._kill_tree(proc)
+                proc.wait()
+            proc.stdout.close()
+            with self._procs_lock:
+                self._live_procs.discard(proc)
+        
+        if fired.is_set():
+            raise subprocess.TimeoutExpired(proc.args, self.install_timeout)
+        
+        return returncode, "".join(tail).strip()
+    
+    def _run_install(self, specs: List[str], pip_opts: List[str], on_line=None) -> Tuple[int, str]:
+        """
+        Install specs into training_libs, falling back to pip if uv fails.
+        
+        uv is used without a capability check, so a uv that rejects these
+        options (or can't run at all) must not fail every package. When the
+        pip retry succeeds, uv is dropped for the rest of this manager's
+        installs.
+        
+        Returns:
+            (returncode, output_tail) of the last run
+            
+        Raises:
+            subprocess.TimeoutExpired: If install_timeout is exceeded
+        """
+        if self._detect_uv():
+            try:
+                returncode, output_tail = self._run_pip_streaming(
+                    self._install_command(specs, pip_opts), on_line
+                )
+            except OSError as e:
+                returncode, output_tail = -1, str(e)
+            if returncode == 0:
+                return returncode, output_tail
+            print(f"[PKG-MGR] uv install failed, retrying with pip:\n{output_tail}")
+        
+        returncode, output_tail = self._run_pip_streaming(
+            self._install_command(specs, pip_opts, use_uv=False), on_line
+        )
+        if returncode == 0 and self._uv_cmd:
+            print("[PKG-MGR] pip succeeded where uv failed, using pip from now on")
+            self._uv_cmd = None
+        return returncode, output_tail
+    
+    def _install_batch(self, pending: List[Tuple[str, str]], pip_opts: List[str],
+                       progress_callback=None, label: str = "batch") -> bool:
+        """
+        Install all pending packages with a single pip invocation.
+        
+        Returns:
+            True if every package installed; False means nothing is assumed
+            installed and the caller should fall back to per-package installs
+        """
+        print(f"[PKG-MGR] [{label}] Installing {len(pending)} packages in one pip run...")
+        if progress_callback:
+            progress_callback(label, f"installing {len(pending)} packages")
+        
+        names = {self._normalize_name(package): package for package, _ in pending}
+        
+        def on_line(line):
+            if not progress_callback:
+                return
+            line = line.strip()
+            # "Collecting diffusers==0.25.1" -> report against that package
+            match = self._COLLECTING_RE.match(line)
+            if match and self._normalize_name(match.group(1)) in names:
+                progress_callback(names[self._normalize_name(match.group(1))], "downloading")
+            elif line.startswith(self._PROGRESS_MARKERS):
+                progress_callback(label, line)
+        
+        try:
+            returncode, output_tail = self._run_install(
+                [f"{package}=={version}" for package, version in pending],
+                pip_opts,
+                on_line
+            )
+        except Exception as e:
+            returncode, output_tail = -1, str(e)
+        
+        if returncode == 0:
+            print(f"[PKG-MGR] [{label}] ✓ Batch install succeeded")
+            if progress_callback:
+                progress_callback(label, "success")
+            return True
+        
+        print(f"[PKG-MGR] [{label}] Batch install failed, retrying per package:\n{output_tail}")
+        if progress_callback:
+            progress_callback(label, "failed, retrying per package")
+        return False
+    
+    def _install_one(self, package: str, version: str, pip_opts: List[str],
+                     progress_callback=None) -> Optional[str]:
+        """
+        Install a single package into training_libs (thread-safe).
+        
+        Returns:
+            None on success, error message on failure
+        """
+        print(f"[PKG-MGR] Installing {package}=={version}...")
+        
+        try:
+            if progress_callback:
+                progress_callback(package, "installing")
+            
+            def on_line(line):
+                if progress_callback and line.lstrip().startswith(self._PROGRESS_MARKERS):
+                    progress_callback(package, line.strip())
+            
+            returncode, output_tail = self._run_install(
+                [f"{package}=={version}"], pip_opts, on_line
+            )
+            
+            if returncode == 0:
+                print(f"[PKG-MGR] ✓ {package} installed")
+                if progress_callback:
+                    progress_callback(package, "success")
+                return None
+            
+            print(f"[PKG-MGR] ✗ {package} failed:\n{output_tail}")
+            if progress_callback:
+                progress_callback(package, "failed")
+            return f"{package}: {output_tail}"
+            
+        except subprocess.TimeoutExpired:
+            print(f"[PKG-MGR] ✗ {package} timeout")
+            if progress_callback:
+                progress_callback(package, "timeout")
+            return f"{package}: Timeout"
+        except Exception as e:
+            print(f"[PKG-MGR] ✗ {package} failed: {e}")
+            if progress_callback:
+                progress_callback(package, "failed")
+            return f"{package}: {str(e)}"
+    
+    def _save_cache(self, installed: List[str], pip_version: Optional[str] = None) -> None:
+        """Write install cache (single source of truth for cache layout)."""
         cache_data = {
             "installed_packages": installed,
             "python_version": f"{sys.version_info.major}.{sys.version_info.minor}",
-            "python_executable": python_exe,
-            "libs_directory": str(self.libs_dir),
+            "note": "torch/torchvision use system packages",
+            "pip_version": pip_version,
         }
         
+        self._write_cache(cache_data)
+    
+    def _write_cache(self, cache_data: Dict) -> None:
+        """Atomically replace the install cache file and the in-memory copy."""
+        # Atomic write: a crash mid-write must not leave a corrupt cache
+        tmp_file = self.cache_file.with_suffix(".json.tmp")
         try:
-            with open(self.cache_file, "w") as f:
-                json.dump(cache_data, f, indent=2)
+            tmp_file.write_bytes(_json_dumps(cache_data))
+            os.replace(tmp_file, self.cache_file)
+            self._cache = cache_data
         except Exception as e:
-            print(f"[PKG-MGR] Warning: Failed to save cache: {e}")
+            print(f"[PKG-MGR] Warning: Cache save failed: {e}")
+    
+    def _load_cache(self) -> Dict:
+        """Read install cache (parsed once per instance), empty dict if missing or corrupt."""
+        if self._cache is not None:
+            return self._cache
         
-        if errors:
-            print(f"[PKG-MGR] Completed with {len(errors)} errors")
-            return False, errors
-        else:
-            print(f"[PKG-MGR] ✓ Successfully installed {len(installed)} packages")
-            return True, []
+        try:
+            data = _json_loads(self.cache_file.read_bytes())
+        except Exception:
+            return {}
+        
+        if not isinstance(data, dict):
+            return {}
+        
+        self._cache = data
+        return data
     
     def get_modified_env(self, base_env: Optional[Dict] = None) -> Dict:
         """
@@ -246,154 +1118,398 @@ class StandalonePackageManager:
         else:
             env = base_env.copy()
         
-        if not self.libs_dir.exists():
+        # Known-installed libs can't vanish without create_libs_dir(force=True)
+        # resetting the memo, so skip the stat in the common case
+        if not self._exists_cache and not self.libs_dir.exists():
             return env
         
-        # Add training_libs to PYTHONPATH (highest priority)
-        libs_path = str(self.libs_dir.absolute())
-        current_pythonpath = env.get("PYTHONPATH", "")
-        
-        if current_pythonpath:
-            env["PYTHONPATH"] = f"{libs_path}{os.pathsep}{current_pythonpath}"
-        else:
-            env["PYTHONPATH"] = libs_path
+        # Same input PYTHONPATH (the usual case: every launch copies os.environ)
+        # always yields the same output, so reuse the last one
+        current = env.get("PYTHONPATH", "")
+        memo = self._pythonpath_memo
+        if memo is None or memo[0] != current:
+            # Add training_libs to PYTHONPATH (highest priority)
+            libs_path = self._libs_path_str
+            # Drop existing copies so repeated/nested calls don't grow the variable
+            other_paths = [
+                p for p in current.split(os.pathsep)
+                if p and p != libs_path
+            ]
+            memo = self._pythonpath_memo = (current, os.pathsep.join([libs_path, *other_paths]))
+        env["PYTHONPATH"] = memo[1]
         
         return env
     
-    def install_packages_with_ui_progress(self) -> Tuple[bool, List[str]]:
-        """
-        Install packages with progress updates to ComfyUI UI.
-        """
-        # Import PromptServer if available
-        try:
-            from server import PromptServer
-        except ImportError:
-            PromptServer = None
+    @staticmethod
+    def _ui_progress_callback():
+        """Build a progress callback that logs to console and ComfyUI UI."""
+        # Resolve server once per install (None when headless / outside ComfyUI)
+        server = getattr(PromptServer, "instance", None)
         
         def progress_callback(package_name, status):
             """Send progress update to UI."""
-            if PromptServer:
-                try:
-                    message = f"[PKG] {package_name}: {status}"
-                    PromptServer.instance.send_sync("flux_train_log", {"line": message})
-                except Exception:
-                    pass
             print(f"[PKG-MGR] {package_name}: {status}")
+            if server is not None:
+                # A failed UI update must never abort the install
+                try:
+                    server.send_sync("flux_train_log", {"line": f"[PKG] {package_name}: {status}"})
+                except Exception as e:
+                    print(f"[PKG-MGR] Warning: UI progress update failed: {e}")
+        
+        return progress_callback
+    
+    def install_packages_with_ui_progress(self, offline: bool = False) -> Tuple[bool, List[str]]:
+        """
+        Install packages with progress updates to ComfyUI UI.
+        """
+        return self.install_packages(progress_callback=self._ui_progress_callback(), offline=offline)
+    
+    def _fast_verify(self) -> bool:
+        """
+        Cheap filesystem-only check that trusts the install cache.
+        
+        Passes when the cache for the current pinned requirement set exists,
+        was written by the same Python major.minor, and every critical package
+        is present in training_libs.
+        No subprocesses are spawned.
+        """
+        # Pins changed (plugin update) -> no cache under the new name -> {}
+        data = self._load_cache()
+        if data.get("python_version") != f"{sys.version_info.major}.{sys.version_info.minor}":
+            return False
         
-        return self.install_packages(progress_callback=progress_callback)
+        # Every critical package is a regular package folder; a leftover
+        # dist-info without it is a broken install (full verify repairs it)
+        for package in self.CRITICAL_PACKAGES:
+            if not (self.libs_dir / package / "__init__.py").is_file():
+                return False
+        
+        return True
     
     def verify_installation(self) -> Tuple[bool, List[str]]:
         """Verify critical packages can be imported from training_libs."""
         if not self.libs_dir.exists():
             return False, ["training_libs directory does not exist"]
         
+        # Nothing was (re)installed since the last successful check, in this
+        # or an earlier session (install runs rewrite the cache without it)
+        signature = self._verify_signature()
+        verified = self._load_cache().get("verified")
+        if isinstance(verified, dict) and verified.get("sig") == signature:
+            return True, list(verified.get("messages", []))
+        
+        # Spec lookup in this process first; spawn Python only if it is inconclusive
+        result = self._verify_in_process()
+        if result is None:
+            result = self._verify_subprocess()
+        
+        # Only persist success - failures must be re-checked after a repair
+        cache_data = self._load_cache()
+        if result[0] and cache_data:
+            self._write_cache({**cache_data, "verified": {"sig": signature, "messages": result[1]}})
+        
+        return result
+    
+    def _verify_signature(self) -> List:
+        """
+        Freshness key for a persisted verification result.
+        
+        Interpreter version, system torch version and mtime_ns of each
+        critical package folder: a reinstall or removal of any of them (or a
+        ComfyUI torch upgrade) changes the key. (The training_libs mtime
+        itself can't be used - writing the cache changes it.)
+        """
+        import importlib.metadata
+        
+        try:
+            torch_version = importlib.metadata.version("torch")
+        except importlib.metadata.PackageNotFoundError:
+            torch_version = None
+        
+        mtimes = []
+        for package in self.CRITICAL_PACKAGES:
+            try:
+                mtimes.append(os.stat(os.path.join(self._libs_path_str, package)).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return [sys.version, torch_version, *mtimes]
+    
+    def _verify_in_process(self) -> Optional[Tuple[bool, List[str]]]:
+        """
+        Locate critical packages in training_libs without importing them.
+        
+        Uses PathFinder restricted to training_libs, so neither sys.path nor
+        already-imported (system) modules in sys.modules affect the result.
+        Lookups execute no module code, so they run concurrently on threads
+        (the cost is directory listing / metadata reads, which release the GIL).
+        
+        Returns:
+            (all_ok, messages), or None if any lookup is inconclusive
+        """
+        import importlib.util
+        import importlib.metadata
+        from importlib.machinery import PathFinder
+        
+        libs_path = self._libs_path_str
+        
+        def lookup(package):
+            spec = PathFinder.find_spec(package, [libs_path])
+            # None = missing, no origin = namespace package: let subprocess decide
+            if spec is None or not spec.origin:
+                return None
+            
+            dist = next(importlib.metadata.distributions(name=package, path=[libs_path]), None)
+            version = dist.version if dist is not None else "unknown"
+            return f"✓ {package}: {version} (isolated)"
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.CRITICAL_PACKAGES))) as executor:
+            # map() keeps CRITICAL_PACKAGES order for the messages
+            messages = list(executor.map(lookup, self.CRITICAL_PACKAGES))
+        
+        if None in messages:
+            return None
+        
+        # Check system torch
+        try:
+            if importlib.util.find_spec("torch") is None:
+                return None
+            torch_version = importlib.metadata.version("torch")
+        except Exception:
+            return None
+        messages.append(f"✓ torch:{torch_version} (system)")
+        
+        return True, messages
+    
+    def _verify_forked(self) -> Optional[List[Dict]]:
+        """
+        Run the import check in a fork()ed child (POSIX only).
+        
+        The child inherits the already-initialized interpreter, skipping
+        interpreter startup, site.py and stdlib loading. Only used while this
+        process is single-threaded (e.g. setup_training_env.py): forking with
+        other threads alive can deadlock the child on locks they hold. Also
+        skipped when this process already imported any module that
+        training_libs provides (e.g. packaging, or ComfyUI's safetensors):
+        the child would reuse those copies, so it would not be equivalent to
+        a fresh interpreter resolving everything from training_libs.
+        
+        Returns:
+            Import results in _VERIFY_TEMPLATE's format, or None if fork
+            is unavailable/unsafe here
+            
+        Raises:
+            subprocess.TimeoutExpired: If the child exceeds verify_timeout
+        """
+        if not hasattr(os, "fork") or threading.active_count() > 1:
+            return None
+        
+        if not self._libs_top_level().isdisjoint(m.partition(".")[0] for m in list(sys.modules)):
+            return None
+        
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        
+        if pid == 0:
+            # Child: import from training_libs, report, exit without cleanup
+            try:
+                os.close(read_fd)
+                sys.path.insert(0, self._libs_path_str)
+                out = []
+                for package in [*self.CRITICAL_PACKAGES, 'torch']:
+                    try:
+                        m = importlib.import_module(package)
+                        out.append({'p': package, 'v': getattr(m, '__version__', 'unknown'),
+                                    'l': getattr(m, '__file__', '?')})
+                    except Exception as e:
+                        out.append({'p': package, 'err': str(e)})
+                data = json.dumps(out).encode("utf-8")
+                while data:
+                    data = data[os.write(write_fd, data):]
+            finally:
+                os._exit(0)
+        
+        # Parent: collect the child's report within verify_timeout
+        os.close(write_fd)
+        chunks = []
+        deadline = time.monotonic() + self.verify_timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                ready, _, _ = select.select([read_fd], [], [], max(remaining, 0))
+                if not ready:
+                    os.kill(pid, signal.SIGKILL)
+                    raise subprocess.TimeoutExpired("verify (fork)", self.verify_timeout)
+                chunk = os.read(read_fd, 65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        finally:
+            os.close(read_fd)
+            os.waitpid(pid, 0)
+        
+        return json.loads(b"".join(chunks)) if chunks else []
+    
+    def _libs_top_level(self) -> set:
+        """Top-level module names importable from training_libs."""
+        names = set()
+        try:
+            with os.scandir(self.libs_dir) as it:
+                for entry in it:
+                    name = entry.name
+                    if name.startswith(".") or name in ("__pycache__", "bin") or name.endswith((".dist-info", ".data")):
+                        continue
+                    if entry.is_dir():
+                        names.add(name)
+                    elif name.endswith(".py"):
+                        names.add(name[:-3])
+                    elif name.endswith((".so", ".pyd")):
+                        names.add(name.partition(".")[0])
+        except OSError:
+            pass
+        return names
+    
+    def _verify_subprocess(self) -> Tuple[bool, List[str]]:
+        """Verify by actually importing packages in a fresh interpreter (or forked child)."""
         python_exe = self._get_python_exe()
         messages = []
         all_ok = True
         
-        # Critical packages to test
-        critical_packages = [
-            'transformers',
-            'tokenizers', 
-            'diffusers',
-            'accelerate',
-            'huggingface_hub',
-            'safetensors',
-        ]
-        
-        for package in critical_packages:
-            # Test import with training_libs prioritized
-            test_code = f"""
-import sys
-sys.path.insert(0, r'{self.libs_dir}')
-
-try:
-    import {package}
-    version = getattr({package}, '__version__', 'unknown')
-    location = {package}.__file__
-    print(f'{package}:{{version}}:{{location}}')
-except Exception as e:
-    print(f'{package}:ERROR:{{str(e)}}')
-"""
+        try:
+            results = self._verify_forked()
             
-            try:
-                result = subprocess.run(
-                    [python_exe, "-c", test_code],
-                    capture_output=True,
-                    text=True,
-                    timeout=15
+            if results is None:
+                # Test all imports in ONE interpreter (training_libs prioritized)
+                test_code = self._VERIFY_TEMPLATE.substitute(
+                    libs=json.dumps(self._libs_path_str),
+                    pkgs=json.dumps(self.CRITICAL_PACKAGES),
                 )
-                
-                output = result.stdout.strip()
-                
-                if 'ERROR' in output:
-                    parts = output.split(':', 2)
-                    error_detail = parts[2] if len(parts) > 2 else "Unknown error"
-                    messages.append(f"✗ {package}: {error_detail[:100]}")
-                    all_ok = False
-                elif output:
-                    parts = output.split(':', 2)
-                    pkg_name = parts[0]
-                    version = parts[1] if len(parts) > 1 else "?"
-                    location = parts[2] if len(parts) > 2 else "?"
-                    
-                    # Check if loaded from training_libs
-                    if 'training_libs' in location:
-                        messages.append(f"✓ {pkg_name}: {version} (isolated)")
-                    else:
-                        messages.append(f"⚠ {pkg_name}: {version} (system - not isolated!)")
-                        # This is OK for now but not ideal
+                _, stdout = self._run_captured([python_exe, "-c", test_code], self.verify_timeout)
+                # Last stdout line holds the JSON (packages may print on import)
+                lines = stdout.strip().splitlines()
+                results = json.loads(lines[-1]) if lines else []
+        except subprocess.TimeoutExpired:
+            return False, ["✗ Verification timeout"]
+        except Exception as e:
+            return False, [f"✗ Import test failed: {e}"]
+        
+        if not results:
+            return False, ["✗ Verification produced no output"]
+        
+        for entry in results:
+            package = entry['p']
+            
+            if 'err' in entry:
+                if package == 'torch':
+                    messages.append("✗ torch: Not available in system")
                 else:
-                    messages.append(f"✗ {package}: No output")
-                    all_ok = False
-                    
-            except subprocess.TimeoutExpired:
-                messages.append(f"✗ {package}: Verification timeout")
-                all_ok = False
-            except Exception as e:
-                messages.append(f"✗ {package}: {str(e)}")
+                    messages.append(f"✗ {package}: {entry['err'][:100]}")
                 all_ok = False
-        
-        # Check system torch
-        try:
-            result = subprocess.run(
-                [python_exe, "-c", "import torch; print(f'torch:{{torch.__version__}}')"],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            if result.returncode == 0:
-                messages.append(f"✓ {result.stdout.strip()} (system)")
+            elif package == 'torch':
+                messages.append(f"✓ torch:{entry['v']} (system)")
+            elif 'training_libs' in (entry['l'] or ''):
+                # Check if loaded from training_libs
+                messages.append(f"✓ {package}: {entry['v']} (isolated)")
             else:
-                messages.append("✗ torch: Not available in system")
-                all_ok = False
-        except Exception:
-            messages.append("✗ torch: Import test failed")
-            all_ok = False
+                messages.append(f"⚠ {package}: {entry['v']} (system - not isolated!)")
+                # This is OK for now but not ideal
         
         return all_ok, messages
     
-    def setup_training_packages(self, force_reinstall: bool = False) -> Tuple[bool, str]:
+    @contextmanager
+    def _setup_lock(self):
+        """
+        Hold an exclusive OS-level lock on base_dir/.setup.lock.
+        
+        Serializes install/repair across processes (and threads), so two
+        ComfyUI workers starting together don't both install into
+        training_libs. Released automatically if the process dies.
+        Not reentrant: code already holding it calls
+        _setup_training_packages_locked() directly.
+        """
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.base_dir / ".setup.lock", "a+b") as lock_file:
+            fd = lock_file.fileno()
+            if sys.platform == "win32":
+                import msvcrt
+                lock_file.seek(0)
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                except OSError:
+                    print("[PKG-MGR] Waiting for another package setup to finish...")
+                    # LK_LOCK gives up after ~10s, so keep retrying
+                    while True:
+                        try:
+                            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            continue
+                try:
+                    yield
+                finally:
+                    lock_file.seek(0)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    print("[PKG-MGR] Waiting for another package setup to finish...")
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+    
+    def setup_training_packages(self, force_reinstall: bool = False, offline: bool = False) -> Tuple[bool, str]:
         """
         Complete setup: create directory and install packages.
         
         Args:
             force_reinstall: Force reinstallation
+            offline: Install from local wheels (downloaded once if missing)
             
         Returns:
             (success, status_message)
         """
-        # Step 1: Create directory
-        if force_reinstall or not self.libs_dir.exists():
-            success, msg = self.create_libs_dir(force=force_reinstall)
-            if not success:
-                return False, msg
+        # Serialize with other processes (ComfyUI workers, CLI --force): a
+        # concurrent reinstall would trash training_libs mid pip --target write
+        with self._setup_lock():
+            return self._setup_training_packages_locked(force_reinstall, offline)
+    
+    def _setup_training_packages_locked(self, force_reinstall: bool, offline: bool) -> Tuple[bool, str]:
+        """setup_training_packages() body; caller must hold _setup_lock()."""
+        # Pins changed since the last install: pip --target won't replace
+        # existing package folders, so start from a clean directory
+        if not force_reinstall and not self.libs_exist() and self._has_stale_cache():
+            print("[PKG-MGR] Requirements changed, reinstalling...")
+            force_reinstall = True
+        
+        # Wheel downloads don't touch training_libs, so they run while the
+        # directory is (re)created
+        self._aborting = False
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            with self._kill_children_on_abort(executor):
+                prefetch = None
+                if offline and not self._has_local_wheels():
+                    prefetch = executor.submit(self._prefetch_wheels, self._ui_progress_callback())
+                
+                # Step 1: Create directory
+                if force_reinstall or not self.libs_dir.exists():
+                    success, msg = self.create_libs_dir(force=force_reinstall)
+                    if not success:
+                        return False, msg
+                
+                if prefetch is not None:
+                    success, msg = prefetch.result()
+                    if not success:
+                        return False, msg
         
         # Step 2: Install packages
+        
         print("[PKG-MGR] Installing training packages...")
         print("[PKG-MGR] This may take 5-10 minutes on first run...")
         
-        success, errors = self.install_packages_with_ui_progress()  # With UI progress
+        success, errors = self.install_packages_with_ui_progress(offline=offline)  # With UI progress
         
         if not success:
             error_msg = "Failed to install some packages:\n" + "\n".join(errors[:5])  # Show first 5 errors
@@ -417,23 +1533,36 @@ def ensure_training_packages(base_dir: Optional[str] = None) -> Tuple[bool, str,
         (success, message, libs_directory_path)
     """
     manager = StandalonePackageManager(base_dir)
+    manager.reap_trash()
     
-    if not manager.libs_exist():
-        print("[PKG-MGR] Training packages not found, installing...")
-        success, msg = manager.setup_training_packages()
-        
-        if not success:
-            return False, msg, None
-    
-    # Verify installation
-    all_ok, messages = manager.verify_installation()
+    # Fast path: trust cache when package layout matches (no subprocess, no lock)
+    if manager.libs_exist() and manager._fast_verify():
+        libs_path = manager._libs_path_str
+        return True, "Training packages ready (cached)", libs_path
     
-    if not all_ok:
-        print("[PKG-MGR] Verification failed, reinstalling...")
-        success, msg = manager.setup_training_packages(force_reinstall=True)
+    # Only one process installs/repairs at a time; a waiting one re-checks
+    # below and finds the finished install
+    with manager._setup_lock():
+        if not manager.libs_exist():
+            print("[PKG-MGR] Training packages not found, installing...")
+            success, msg = manager._setup_training_packages_locked(False, False)
+            
+            if not success:
+                return False, msg, None
         
-        if not success:
-            return False, msg, None
+        if manager._fast_verify():
+            libs_path = manager._libs_path_str
+            return True, "Training packages ready (cached)", libs_path
+        
+        # Verify installation
+        all_ok, messages = manager.verify_installation()
+        
+        if not all_ok:
+            print("[PKG-MGR] Verification failed, reinstalling...")
+            success, msg = manager._setup_training_packages_locked(True, False)
+            
+            if not success:
+                return False, msg, None
     
-    libs_path = str(manager.libs_dir.absolute())
+    libs_path = manager._libs_path_str
     return True, "Training packages ready", libs_path
@@ -0,0 +1,170 @@
+"""
+Tests for StandalonePackageManager's filesystem helpers.
+
+Everything here runs against a tmp_path plugin directory: no pip, uv or
+subprocess is started.
+"""
+
+import sys
+import os
+import json
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from venv_manager import StandalonePackageManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = StandalonePackageManager(str(tmp_path))
+    manager.libs_dir.mkdir()
+    return manager
+
+
+def write_cache(manager, **extra):
+    data = {"python_version": f"{sys.version_info.major}.{sys.version_info.minor}", **extra}
+    manager.cache_file.write_text(json.dumps(data))
+
+
+def make_packages(manager, packages):
+    for package in packages:
+        (manager.libs_dir / package).mkdir()
+        (manager.libs_dir / package / "__init__.py").touch()
+
+
+# Distribution names normalize the way dist-info folder names do
+@pytest.mark.parametrize('name, expected', [
+    ('PyYAML', 'pyyaml'),
+    ('huggingface-hub', 'huggingface_hub'),
+    ('huggingface_hub', 'huggingface_hub'),
+    ('zope.interface', 'zope_interface'),
+    ('Foo--Bar__baz', 'foo_bar_baz'),
+])
+def test_normalize_name(name, expected):
+    assert StandalonePackageManager._normalize_name(name) == expected
+
+
+def test_installed_dists(manager):
+    for folder in ('PyYAML-6.0.1.dist-info', 'huggingface_hub-0.20.3.dist-info', 'yaml'):
+        (manager.libs_dir / folder).mkdir()
+    # A file with a dist-info name is not an installed distribution
+    (manager.libs_dir / 'stray-1.0.dist-info').touch()
+
+    assert manager._installed_dists() == {('pyyaml', '6.0.1'), ('huggingface_hub', '0.20.3')}
+
+
+def test_installed_dists_missing_dir(tmp_path):
+    assert StandalonePackageManager(str(tmp_path))._installed_dists() == set()
+
+
+def test_fast_verify(manager):
+    write_cache(manager)
+    make_packages(manager, manager.CRITICAL_PACKAGES)
+    assert manager._fast_verify()
+
+
+def test_fast_verify_requires_package_init(manager):
+    write_cache(manager)
+    make_packages(manager, manager.CRITICAL_PACKAGES[1:])
+    # Leftover dist-info without the package folder is a broken install
+    missing = manager.CRITICAL_PACKAGES[0]
+    (manager.libs_dir / f"{missing}-1.0.dist-info").mkdir()
+    assert not manager._fast_verify()
+
+    # A folder without __init__.py is not enough either
+    (manager.libs_dir / missing).mkdir()
+    assert not manager._fast_verify()
+
+
+def test_fast_verify_other_python(manager):
+    write_cache(manager, python_version="2.7")
+    make_packages(manager, manager.CRITICAL_PACKAGES)
+    assert not manager._fast_verify()
+
+
+# get_modified_env puts training_libs first, exactly once
+@pytest.mark.parametrize('pythonpath', [
+    '',
+    '/other',
+    '{libs}',
+    '{libs}{sep}/other{sep}{libs}',
+    '{sep}/other{sep}{sep}/more{sep}',
+])
+def test_modified_env_pythonpath(manager, pythonpath):
+    libs, sep = manager._libs_path_str, os.pathsep
+    base_env = {"PYTHONPATH": pythonpath.format(libs=libs, sep=sep), "KEEP": "1"}
+
+    env = manager.get_modified_env(base_env)
+
+    paths = env["PYTHONPATH"].split(sep)
+    assert paths[0] == libs
+    assert paths.count(libs) == 1
+    assert '' not in paths
+    assert [p for p in paths if p != libs] == [p for p in base_env["PYTHONPATH"].split(sep) if p and p != libs]
+    assert env["KEEP"] == "1"
+    # Caller's dict is left alone
+    assert base_env["PYTHONPATH"] == pythonpath.format(libs=libs, sep=sep)
+
+
+def test_modified_env_is_stable(manager):
+    env = manager.get_modified_env({"PYTHONPATH": "/other"})
+    assert manager.get_modified_env(env)["PYTHONPATH"] == env["PYTHONPATH"]
+
+
+def test_modified_env_without_libs(tmp_path):
+    manager = StandalonePackageManager(str(tmp_path))
+    assert manager.get_modified_env({"PYTHONPATH": "/other"}) == {"PYTHONPATH": "/other"}
+
+
+# Install cache is named after the pinned requirement set
+def test_cache_file_named_after_requirements(manager, monkeypatch):
+    assert manager.cache_file.name == f".install_cache.{manager._requirements_hash()}.json"
+    assert not manager.libs_exist()
+
+    write_cache(manager)
+    assert manager.libs_exist()
+
+    # Changed pins -> different name -> the old cache is not found
+    monkeypatch.setitem(StandalonePackageManager.TRAINING_REQUIREMENTS, 'toml', '0.10.1')
+    repinned = StandalonePackageManager(str(manager.base_dir))
+    assert repinned.cache_file != manager.cache_file
+    assert not repinned.libs_exist()
+    assert repinned._has_stale_cache()
+
+
+@pytest.mark.parametrize('name, stale', [
+    ('.install_cache.json', True),  # Legacy name from before hash naming
+    ('.install_cache.0123456789abcdef.json', True),
+    ('.install_cache.0123456789abcdef.json.tmp', False),
+    ('install_cache.json', False),
+])
+def test_has_stale_cache(manager, name, stale):
+    (manager.libs_dir / name).write_text("{}")
+    assert manager._has_stale_cache() is stale
+
+
+def test_current_cache_is_not_stale(manager):
+    write_cache(manager)
+    assert not manager._has_stale_cache()
+
+
+def test_missing_libs_dir_is_not_stale(tmp_path):
+    assert not StandalonePackageManager(str(tmp_path))._has_stale_cache()
+
+
+def test_legacy_cache_forces_reinstall(manager, monkeypatch):
+    (manager.libs_dir / '.install_cache.json').write_text('{"installed_packages": []}')
+    calls = []
+    monkeypatch.setattr(manager, 'create_libs_dir', lambda force=False: calls.append(force) or (True, ""))
+    monkeypatch.setattr(manager, 'install_packages_with_ui_progress', lambda offline=False: (False, ["stop"]))
+
+    manager.setup_training_packages()
+
+    assert calls == [True]
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
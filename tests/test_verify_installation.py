@@ -0,0 +1,82 @@
+"""
+Tests for verify_installation.py: static node scan and check selection.
+
+Selection tests replace run_checks, so no check actually runs (no torch,
+CUDA or network access).
+"""
+
+import sys
+import os
+
+import pytest
+
+# Add plugin root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import verify_installation
+from verify_installation import CHECKS, SLOW_CHECKS, _scan_node_names
+
+
+def test_scan_real_nodes():
+    names = _scan_node_names(verify_installation.HERE / "nodes.py")
+    assert names is not None, "❌ nodes.py mapping is no longer a plain dict literal"
+    assert "Flux2_8GB_Config" in names
+
+
+@pytest.mark.parametrize('source, expected', [
+    ('NODE_CLASS_MAPPINGS = {"A": A, "B": B}\n', ["A", "B"]),
+    ('NODE_CLASS_MAPPINGS = dict(A=A)\n', None),
+    ('NODE_CLASS_MAPPINGS = {NAME: A}\n', None),
+    ('OTHER = {"A": A}\n', None),
+])
+def test_scan_node_names(tmp_path, source, expected):
+    nodes_file = tmp_path / "nodes.py"
+    nodes_file.write_text(source)
+    assert _scan_node_names(nodes_file) == expected
+
+
+@pytest.fixture
+def selected(monkeypatch):
+    """Run main() and return the names of the checks it would run."""
+    ran = []
+
+    def fake_run_checks(checks):
+        ran.extend(checks)
+        return {name: True for name in checks}
+
+    monkeypatch.setattr(verify_installation, 'run_checks', fake_run_checks)
+
+    def select(*argv):
+        assert verify_installation.main(list(argv)) == 0
+        return ran
+
+    return select
+
+
+@pytest.mark.parametrize('argv, expected', [
+    ((), list(CHECKS)),
+    (('--quick',), [name for name in CHECKS if name not in SLOW_CHECKS]),
+    (('--only', 'sd-scripts'), ['sd-scripts']),
+    (('--only', 'Dependencies', '--only', 'sd-scripts'), ['Dependencies', 'sd-scripts']),
+    (('--skip', 'FLUX.1 Model'), [name for name in CHECKS if name != 'FLUX.1 Model']),
+    (('--only', 'sd-scripts', '--only', 'CUDA/GPU', '--quick'), ['sd-scripts']),
+])
+def test_selection(selected, argv, expected):
+    # Checks keep CHECKS order regardless of argument order
+    assert selected(*argv) == expected
+
+
+@pytest.mark.parametrize('argv', [
+    ('--only', 'sd-scripts', '--skip', 'sd-scripts'),
+    ('--only', 'CUDA/GPU', '--quick'),
+    ('--only', 'no such check'),
+])
+def test_bad_selection(monkeypatch, argv):
+    monkeypatch.setattr(verify_installation, 'run_checks', lambda checks: pytest.fail("❌ checks ran"))
+    with pytest.raises(SystemExit) as exc:
+        verify_installation.main(list(argv))
+    assert exc.value.code == 2
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
@@ -4,35 +4,63 @@ Verification script for ComfyUI-Flux2-LoRA-Manager installation.
 Checks all dependencies and setup before first use.
 
 Usage:
-    python verify_installation.py
+    python verify_installation.py                 # Full check (default, use in CI)
+    python verify_installation.py --quick         # Skip GPU and network checks
+    python verify_installation.py --only sd-scripts --only Dependencies
+    python verify_installation.py --skip "FLUX.1 Model"
 """
 
 import sys
 import os
+import io
+import argparse
+import ast
+import functools
+import socket
 import subprocess
+import threading
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from importlib.metadata import version as metadata_version, PackageNotFoundError
 from pathlib import Path
+from types import ModuleType
 
-class Colors:
-    GREEN = '\033[92m'
-    YELLOW = '\033[93m'
-    RED = '\033[91m'
-    BLUE = '\033[94m'
-    END = '\033[0m'
+HERE = Path(__file__).resolve().parent
+CWD = Path.cwd()
+
+# Common sd-scripts locations
+_SD_SCRIPTS_CANDIDATES = (
+    CWD / "sd-scripts",
+    CWD / "kohya_ss" / "sd-scripts",
+    CWD.parent / "sd-scripts",
+    CWD.parent / "kohya_train" / "kohya_ss" / "sd-scripts",
+    Path("G:/ComfyUI-StableDif-t27-p312-cu128-v2.1/kohya_train/kohya_ss/sd-scripts"),
+    Path("C:/AI/sd-scripts"),
+)
+
+# ANSI colors
+GREEN = '\033[92m'
+YELLOW = '\033[93m'
+RED = '\033[91m'
+BLUE = '\033[94m'
+END = '\033[0m'
+
+# Colored status prefixes, formatted once
+_PREFIX = {
+    "✓": f"{GREEN}✓{END}",
+    "✗": f"{RED}✗{END}",
+    "!": f"{YELLOW}!{END}",
+    "→": f"{BLUE}→{END}",
+}
 
 def print_status(status: str, message: str):
     """Print colored status message."""
-    if status == "✓":
-        print(f"{Colors.GREEN}✓{Colors.END} {message}")
-    elif status == "✗":
-        print(f"{Colors.RED}✗{Colors.END} {message}")
-    elif status == "!":
-        print(f"{Colors.YELLOW}!{Colors.END} {message}")
-    elif status == "→":
-        print(f"{Colors.BLUE}→{Colors.END} {message}")
+    # One pre-joined write (no print() separator/end handling)
+    sys.stdout.write(f"{_PREFIX[status]} {message}\n")
 
 def check_python_version():
     """Check Python version (3.10+)."""
-    print(f"\n{Colors.BLUE}=== Python Version ==={Colors.END}")
+    print(f"\n{BLUE}=== Python Version ==={END}")
     version = sys.version_info
     print(f"Python {version.major}.{version.minor}.{version.micro}")
     
@@ -45,7 +73,11 @@ def check_python_version():
 
 def check_cuda():
     """Check CUDA availability."""
-    print(f"\n{Colors.BLUE}=== CUDA/GPU ==={Colors.END}")
+    print(f"\n{BLUE}=== CUDA/GPU ==={END}")
+    
+    # Load CUDA kernels on first use only - this check never launches any,
+    # so startup time and memory stay small
+    os.environ.setdefault("CUDA_MODULE_LOADING", "LAZY")
     
     try:
         import torch
@@ -53,12 +85,13 @@ def check_cuda():
         
         if has_cuda:
             device_count = torch.cuda.device_count()
-            device_name = torch.cuda.get_device_name(0)
-            print_status("✓", f"CUDA available: {device_name}")
+            # One properties query gives both name and VRAM
+            props = torch.cuda.get_device_properties(0)
+            print_status("✓", f"CUDA available: {props.name}")
             print_status("✓", f"GPU count: {device_count}")
             
             # Check VRAM
-            vram_gb = torch.cuda.get_device_properties(0).total_memory / (1024**3)
+            vram_gb = props.total_memory / (1024**3)
             print_status("✓", f"Total VRAM: {vram_gb:.1f} GB")
             
             if vram_gb >= 8:
@@ -80,7 +113,7 @@ def check_cuda():
 
 def check_dependencies():
     """Check critical Python packages."""
-    print(f"\n{Colors.BLUE}=== Python Dependencies ==={Colors.END}")
+    print(f"\n{BLUE}=== Python Dependencies ==={END}")
     
     packages = {
         "torch": "2.1.0+",
@@ -92,43 +125,63 @@ def check_dependencies():
         "numpy": "Any",
     }
     
+    # Distribution / import names where they differ from the display name
+    dist_names = {"pillow": "Pillow"}
+    import_names = {"pillow": "PIL"}
+    
     all_ok = True
     
+    # find_spec proves the package is importable and metadata gives its
+    # version - neither executes the (very heavy) torch/diffusers __init__
     for pkg, required_version in packages.items():
         try:
-            mod = __import__(pkg)
-            version = getattr(mod, "__version__", "Unknown")
+            if importlib.util.find_spec(import_names.get(pkg, pkg)) is None:
+                print_status("✗", f"{pkg} (required version {required_version})")
+                all_ok = False
+                continue
+            
+            try:
+                version = metadata_version(dist_names.get(pkg, pkg))
+            except PackageNotFoundError:
+                version = "Unknown"
             print_status("✓", f"{pkg} {version}")
-        except ImportError:
-            print_status("✗", f"{pkg} (required version {required_version})")
-            all_ok = False
         except Exception as e:
             print_status("!", f"{pkg} (error checking: {e})")
     
     return all_ok
 
+def _probe_sd_scripts(path: Path):
+    """Return (has flux_train_network.py, folder exists) for one candidate."""
+    # Probe the script first: one access() call settles the common outcomes
+    if os.access(path / "flux_train_network.py", os.F_OK):
+        return True, True
+    return False, os.access(path, os.F_OK)
+
+@functools.lru_cache(maxsize=1)
+def _find_sd_scripts():
+    """
+    Probe every sd-scripts candidate; results are cached for the process.
+    
+    Candidates are fixed at import time (CWD), so repeated programmatic runs
+    reuse the result. Call _find_sd_scripts.cache_clear() after installing
+    sd-scripts to re-scan.
+    """
+    # Probe all candidates at once: on network drives each probe is a round
+    # trip, so the search costs one RTT instead of one per location
+    with ThreadPoolExecutor(max_workers=len(_SD_SCRIPTS_CANDIDATES)) as executor:
+        return tuple(executor.map(_probe_sd_scripts, _SD_SCRIPTS_CANDIDATES))
+
 def check_sd_scripts():
     """Check if sd-scripts is available."""
-    print(f"\n{Colors.BLUE}=== sd-scripts (Kohya) ==={Colors.END}")
-    
-    # Common locations
-    search_paths = [
-        Path.cwd() / "sd-scripts",
-        Path.cwd() / "kohya_ss" / "sd-scripts",
-        Path.cwd().parent / "sd-scripts",
-        Path.cwd().parent / "kohya_train" / "kohya_ss" / "sd-scripts",
-        Path("G:/ComfyUI-StableDif-t27-p312-cu128-v2.1/kohya_train/kohya_ss/sd-scripts"),
-        Path("C:/AI/sd-scripts"),
-    ]
-    
-    for path in search_paths:
-        if path.exists():
-            flux_script = path / "flux_train_network.py"
-            if flux_script.exists():
-                print_status("✓", f"Found at: {path}")
-                return True
-            else:
-                print_status("!", f"Found folder {path} but missing flux_train_network.py")
+    print(f"\n{BLUE}=== sd-scripts (Kohya) ==={END}")
+    
+    # Report in priority order, as a sequential search would
+    for path, (has_script, has_folder) in zip(_SD_SCRIPTS_CANDIDATES, _find_sd_scripts()):
+        if has_script:
+            print_status("✓", f"Found at: {path}")
+            return True
+        if has_folder:
+            print_status("!", f"Found folder {path} but missing flux_train_network.py")
     
     print_status("✗", "sd-scripts not found in common locations")
     print("  Please install: git clone https://github.com/kohya-ss/sd-scripts")
@@ -137,30 +190,67 @@ def check_sd_scripts():
 
 def check_models():
     """Check if FLUX.1 models are accessible."""
-    print(f"\n{Colors.BLUE}=== FLUX.1 Model ==={Colors.END}")
+    print(f"\n{BLUE}=== FLUX.1 Model ==={END}")
     
+    # A plain TCP connect tests reachability without importing transformers
+    print_status("→", "Checking HuggingFace connectivity...")
     try:
-        from transformers import AutoTokenizer, CLIPTokenizer
-        
-        # Try to download metadata (not the full model)
-        print_status("→", "Checking HuggingFace connectivity...")
-        
-        # This will fail if offline, but shows proper error
+        with socket.create_connection(("huggingface.co", 443), timeout=3):
+            pass
         print_status("✓", "HuggingFace accessible")
         print_status("→", "First training will auto-download FLUX.1-dev (~50GB)")
         return True
         
-    except Exception as e:
-        print_status("!", f"HuggingFace check failed: {e}")
+    except OSError as e:
+        print_status("!", f"HuggingFace unreachable: {e}")
         print("  If offline, pre-download: huggingface-cli download black-forest-labs/FLUX.1-dev")
         return False
 
+def _scan_node_names(nodes_file: Path):
+    """
+    Return NODE_CLASS_MAPPINGS keys by parsing nodes.py (no code is executed).
+    
+    Returns None if the mapping is not a dict literal with constant keys.
+    """
+    tree = ast.parse(nodes_file.read_bytes(), filename=str(nodes_file))
+    for node in tree.body:
+        if (isinstance(node, ast.Assign)
+                and any(isinstance(t, ast.Name) and t.id == "NODE_CLASS_MAPPINGS" for t in node.targets)
+                and isinstance(node.value, ast.Dict)
+                and all(isinstance(k, ast.Constant) for k in node.value.keys)):
+            return [k.value for k in node.value.keys]
+    return None
+
+_VERIFY_PACKAGE = "_flux2_verify_plugin"
+
+def _load_node_mappings(nodes_file: Path) -> dict:
+    """
+    Execute nodes.py as a submodule of a throwaway package and return its mappings.
+    
+    nodes.py uses relative imports (from .src...), so it must run inside a
+    package. The package is an empty stand-in for the plugin folder (its
+    __init__.py is not executed), and nothing is added to sys.path. All
+    modules loaded this way are removed from sys.modules afterwards.
+    """
+    package = ModuleType(_VERIFY_PACKAGE)
+    package.__path__ = [str(nodes_file.parent)]
+    sys.modules[_VERIFY_PACKAGE] = package
+    try:
+        spec = importlib.util.spec_from_file_location(f"{_VERIFY_PACKAGE}.nodes", nodes_file)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+        return module.NODE_CLASS_MAPPINGS
+    finally:
+        for name in [m for m in sys.modules if m == _VERIFY_PACKAGE or m.startswith(_VERIFY_PACKAGE + ".")]:
+            del sys.modules[name]
+
 def check_comfyui_integration():
     """Check if plugin is properly integrated."""
-    print(f"\n{Colors.BLUE}=== ComfyUI Integration ==={Colors.END}")
+    print(f"\n{BLUE}=== ComfyUI Integration ==={END}")
     
     # Check if nodes.py exists
-    nodes_file = Path(__file__).parent / "nodes.py"
+    nodes_file = HERE / "nodes.py"
     if nodes_file.exists():
         print_status("✓", "nodes.py found")
     else:
@@ -168,17 +258,19 @@ def check_comfyui_integration():
         return False
     
     # Check if __init__.py exists
-    init_file = Path(__file__).parent / "__init__.py"
+    init_file = HERE / "__init__.py"
     if init_file.exists():
         print_status("✓", "__init__.py found")
     else:
         print_status("✗", "__init__.py not found - check installation")
         return False
     
-    # Try to import
+    # Read the registered names statically; execute nodes.py (and with it
+    # torch/diffusers) only if the mapping isn't a plain dict literal
     try:
-        sys.path.insert(0, str(Path(__file__).parent))
-        from nodes import NODE_CLASS_MAPPINGS
+        NODE_CLASS_MAPPINGS = _scan_node_names(nodes_file)
+        if NODE_CLASS_MAPPINGS is None:
+            NODE_CLASS_MAPPINGS = _load_node_mappings(nodes_file)
         
         if "Flux2_8GB_Config" in NODE_CLASS_MAPPINGS:
             print_status("✓", "Nodes registered correctly")
@@ -195,12 +287,14 @@ def check_comfyui_integration():
 
 def check_training_packages():
     """Check if training_libs are installed."""
-    print(f"\n{Colors.BLUE}=== Training Packages ==={Colors.END}")
+    print(f"\n{BLUE}=== Training Packages ==={END}")
     
-    training_libs = Path(__file__).parent / "training_libs"
+    training_libs = HERE / "training_libs"
     
     if training_libs.exists():
-        libs_count = len(list(training_libs.glob("*/")))
+        # scandir reports entry types from the directory listing (no stat per entry)
+        with os.scandir(training_libs) as it:
+            libs_count = sum(1 for entry in it if entry.is_dir(follow_symlinks=False))
         print_status("✓", f"training_libs directory exists ({libs_count} packages)")
         return True
     else:
@@ -208,46 +302,119 @@ def check_training_packages():
         print("  Run: python setup_training_env.py")
         return True  # Not critical, can be auto-created
 
-def main():
+class _PerThreadStdout:
+    """sys.stdout stand-in that sends each check thread's prints to its own buffer."""
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+    
+    def write(self, text):
+        buffer = getattr(self._local, "buffer", None)
+        return (buffer if buffer is not None else self.stream).write(text)
+    
+    def flush(self):
+        self.stream.flush()
+    
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+    
+    def capture(self, check):
+        """Run check with its output buffered; return (result, output)."""
+        self._local.buffer = io.StringIO()
+        try:
+            return check(), self._local.buffer.getvalue()
+        finally:
+            self._local.buffer = None
+
+def run_checks(checks: dict) -> dict:
+    """
+    Run independent checks concurrently, printing their output in order.
+    
+    Checks are dominated by imports, filesystem probes and network waits, so
+    total time approaches the slowest check instead of the sum. Each check's
+    output is buffered and written in one piece, so sections never interleave.
+    """
+    proxy = _PerThreadStdout(sys.stdout)
+    sys.stdout = proxy
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+            futures = {name: executor.submit(proxy.capture, check) for name, check in checks.items()}
+            for name, future in futures.items():
+                results[name], output = future.result()
+                proxy.stream.write(output)
+    finally:
+        sys.stdout = proxy.stream
+    return results
+
+CHECKS = {
+    "Python Version": check_python_version,
+    "CUDA/GPU": check_cuda,
+    "Dependencies": check_dependencies,
+    "sd-scripts": check_sd_scripts,
+    "FLUX.1 Model": check_models,
+    "ComfyUI Integration": check_comfyui_integration,
+    "Training Packages": check_training_packages,
+}
+
+# Checks --quick leaves out: torch/CUDA initialization and network access
+SLOW_CHECKS = {"CUDA/GPU", "FLUX.1 Model"}
+
+def main(argv=None):
     """Run all checks."""
-    print(f"\n{Colors.BLUE}{'='*60}{Colors.END}")
-    print(f"{Colors.BLUE}ComfyUI-Flux2-LoRA-Manager Installation Verification{Colors.END}")
-    print(f"{Colors.BLUE}{'='*60}{Colors.END}")
-    
-    results = {
-        "Python Version": check_python_version(),
-        "CUDA/GPU": check_cuda(),
-        "Dependencies": check_dependencies(),
-        "sd-scripts": check_sd_scripts(),
-        "FLUX.1 Model": check_models(),
-        "ComfyUI Integration": check_comfyui_integration(),
-        "Training Packages": check_training_packages(),
+    parser = argparse.ArgumentParser(description="Verify Flux2 LoRA Manager installation")
+    parser.add_argument("--quick", action="store_true",
+                        help="Skip checks that initialize CUDA or use the network")
+    parser.add_argument("--only", action="append", metavar="NAME", choices=list(CHECKS),
+                        help="Run only this check (repeatable)")
+    parser.add_argument("--skip", action="append", metavar="NAME", choices=list(CHECKS),
+                        help="Skip this check (repeatable)")
+    args = parser.parse_args(argv)
+    
+    skipped = set(args.skip or ())
+    if args.quick:
+        skipped |= SLOW_CHECKS
+    checks = {
+        name: check for name, check in CHECKS.items()
+        if name not in skipped and (not args.only or name in args.only)
     }
+    if not checks:
+        parser.error("no checks selected")
+    
+    print(f"\n{BLUE}{'='*60}{END}")
+    print(f"{BLUE}ComfyUI-Flux2-LoRA-Manager Installation Verification{END}")
+    print(f"{BLUE}{'='*60}{END}")
+    
+    results = run_checks(checks)
     
     # Summary
-    print(f"\n{Colors.BLUE}=== Summary ==={Colors.END}")
+    print(f"\n{BLUE}=== Summary ==={END}")
     
-    passed = sum(1 for v in results.values() if v)
+    passed = 0
     total = len(results)
     
     for check, result in results.items():
-        status = "✓" if result else "✗"
-        print_status(status, f"{check}: {'OK' if result else 'FAILED'}")
+        passed += bool(result)
+        if result:
+            print_status("✓", f"{check}: OK")
+        else:
+            print_status("✗", f"{check}: FAILED")
     
-    print(f"\n{Colors.BLUE}{'='*60}{Colors.END}")
+    print(f"\n{BLUE}{'='*60}{END}")
     
     if passed == total:
-        print(f"{Colors.GREEN}✓ All checks passed! You're ready to train.{Colors.END}")
+        print(f"{GREEN}✓ All checks passed! You're ready to train.{END}")
         print("\nNext steps:")
         print("1. Restart ComfyUI (if you just installed)")
         print("2. Create workflow: Config → Runner → Stopper")
         print("3. Set parameters and click 'Queue Prompt'")
-        print(f"\nSee {Colors.BLUE}USAGE_GUIDE.md{Colors.END} for detailed instructions.")
+        print(f"\nSee {BLUE}USAGE_GUIDE.md{END} for detailed instructions.")
         return 0
     else:
-        print(f"{Colors.RED}✗ {total - passed} check(s) failed.{Colors.END}")
+        print(f"{RED}✗ {total - passed} check(s) failed.{END}")
         print("\nPlease fix the issues above and run again.")
-        print(f"See {Colors.BLUE}TROUBLESHOOTING.md{Colors.END} for common issues.")
+        print(f"See {BLUE}TROUBLESHOOTING.md{END} for common issues.")
         return 1
 
 if __name__ == "__main__":